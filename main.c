@@ -1,3 +1,4 @@
+#define _GNU_SOURCE
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
@@ -6,17 +7,23 @@
 #include <sys/wait.h>
 #include <sys/ioctl.h>
 #include <termios.h>   
-#include <ncurses.h>
 #include <time.h>
 #include <errno.h>
 #include <signal.h>
 #include <sys/statvfs.h>
-#include <pwd.h>
 #include <limits.h>
 #include <fcntl.h>
 #include <ctype.h>
+#include <stdarg.h>
+#include <dirent.h>
 #include <sys/stat.h>
+#include <sys/sendfile.h>
 #include <sys/sysinfo.h>
+#include <sys/utsname.h>
+#include <sys/socket.h>
+#include <sys/select.h>
+#include <netinet/in.h>
+#include <arpa/inet.h>
 
 /* Configuration Constants */
 #define OUTPUT_BUFFER_SIZE 4096
@@ -24,17 +31,41 @@
 #define BACKUP_LOG "/var/log/blackutility.log.bak"
 #define LOCK_FILE "/var/lock/blackutility.lock"
 #define LOG_FILE "/var/log/blackutility.log"
-#define TEMP_FILE "results.txt"
+#define TEMP_FILE "/tmp/blackutility_tools.list"
+#define TEMP_FILE_TMP TEMP_FILE ".tmp"
+#define STATE_FILE "/var/tmp/blackutility.state"
+// v2: entries are bare package names; v1 files held pacman group names
+// or whole apt-cache search lines, which the installed-set comparisons
+// and post-install verification can never match, so they are discarded
+#define STATE_FILE_HEADER "# blackutility-state v2"
+#define TOOL_CACHE_DIR "/var/cache/blackutility"
+#define TOOL_CACHE_FILE TOOL_CACHE_DIR "/tools-v2.list"
+#define BLACKARCH_SYNC_DB "/var/lib/pacman/sync/blackarch.db"
 #define KALI_SOURCES_FILE "/etc/apt/sources.list.d/blackutil.list"
 #define KALI_KEYRING_URL "https://http.kali.org/pool/main/k/kali-archive-keyring/kali-archive-keyring_2024.1_all.deb"
 #define KALI_REPO_LINE "deb http://http.kali.org/kali kali-rolling main contrib non-free non-free-firmware"
 #define TEMP_KEYRING_DEB "/tmp/kali-keyring.deb"
+#define KALI_KEYRING_GPG "/usr/share/keyrings/kali-archive-keyring.gpg"
+
+/* Keyring mirrors, tried in order; kali.download is the CDN fronting the
+ * same package pool, so a redirector outage no longer blocks setup */
+static const char* const KALI_KEYRING_MIRRORS[] = {
+    KALI_KEYRING_URL,
+    "https://kali.download/kali/pool/main/k/kali-archive-keyring/kali-archive-keyring_2024.1_all.deb",
+    NULL
+};
 
 /* System Requirements */
-#define MIN_DISK_SPACE 10737418240  // 10GB in bytes
+#define BYTES_PER_GB (1ULL << 30)
+#define MIN_DISK_SPACE (10 * BYTES_PER_GB)  // 10GB in bytes
 #define MIN_RAM 4096                 // 4GB in MB
 #define MAX_RETRIES 3
 #define TIMEOUT_SECONDS 300
+#define INSTALL_CHUNK_SIZE 50
+
+#define LOG_BUFFER_SIZE 65536
+#define MAX_LOG_SIZE (5 * 1024 * 1024)
+#define PIPE_BUFFER_SIZE 65536
 
 /* UI Constants */
 #define LOADER_WIDTH 50
@@ -95,6 +126,14 @@ const char* BANNER =
     "                    " SYMBOL_INFO " 0xb0rn3@proton.me\n" 
     "                    " SYMBOL_ARROW " twitter.com/0xb0rn3\n" RESET;
 
+/* Kali tool categories used to build the Debian tool list */
+static const char* const KALI_CATEGORIES[] = {
+    "information-gathering", "vulnerability-analysis",
+    "wireless-attacks", "web-applications", "exploitation-tools",
+    "forensics-tools", "stress-testing", "password-attacks",
+    "reverse-engineering", "sniffing-spoofing", NULL
+};
+
 typedef enum {
     SYSTEM_UNKNOWN,
     SYSTEM_ARCH,
@@ -106,6 +145,7 @@ static struct termios orig_termios;
 static int terminal_initialized = 0;
 volatile sig_atomic_t keep_running = 1;
 volatile sig_atomic_t cleanup_needed = 0;
+static int stdout_is_tty = 1;
 FILE* log_fp = NULL;
 int lock_fd = -1;
 
@@ -114,6 +154,7 @@ typedef struct {
     int suppress_output;
     char buffer[OUTPUT_BUFFER_SIZE];
     FILE* output_file;
+    int saved_stderr;
 } OutputControl;
 
 typedef struct {
@@ -147,17 +188,25 @@ typedef struct {
 OutputControl g_output = {
     .suppress_output = 1,
     .buffer = {0},
-    .output_file = NULL
+    .output_file = NULL,
+    .saved_stderr = -1
 };
 
 GlobalProgress g_progress = {0};
 
 /* Function Declarations */
 void log_message(const char* message, const char* level);
+void log_flush(void);
+void log_messagef(const char* level, const char* format, ...)
+        __attribute__((format(printf, 2, 3)));
 void cleanup_resources(void);
 void signal_handler(int signum);
+void winch_handler(int signum);
 void show_smooth_progress(const char* package, float percentage);
 int execute_command(const char* command);
+void free_tool_list(char** tools, int count);
+char** load_tool_list(const char* path, int* count);
+SystemType detect_system_type(void);
 
 /* Terminal Handling Functions */
 void disable_raw_mode() {
@@ -188,14 +237,38 @@ int enable_raw_mode() {
 
 /* Output Control Functions */
 void redirect_output(void) {
-    g_output.output_file = fopen(PACMAN_OUTPUT_FILE, "w+");
+    // Children get the capture as fd 2 via the dup2 below; the original
+    // descriptors are close-on-exec so they are not leaked a second time
+    g_output.output_file = fopen(PACMAN_OUTPUT_FILE, "w+e");
     if (g_output.output_file) {
+        // Remember where stderr pointed so restore_output can put it
+        // back; otherwise stderr stays wired to a closed capture file
+        g_output.saved_stderr = fcntl(STDERR_FILENO, F_DUPFD_CLOEXEC, 0);
         dup2(fileno(g_output.output_file), STDERR_FILENO);
     }
 }
 
+/* The capture file stays open for the whole install phase; children
+ * inherit it as their stderr, so truncating it between commands gives
+ * per-command isolation without the shell reopening the path on every
+ * spawn */
+void reset_captured_output(void) {
+    if (g_output.output_file) {
+        fflush(g_output.output_file);
+        if (ftruncate(fileno(g_output.output_file), 0) != 0) {
+            return;
+        }
+        rewind(g_output.output_file);
+    }
+}
+
 void restore_output(void) {
     if (g_output.output_file) {
+        if (g_output.saved_stderr >= 0) {
+            dup2(g_output.saved_stderr, STDERR_FILENO);
+            close(g_output.saved_stderr);
+            g_output.saved_stderr = -1;
+        }
         fclose(g_output.output_file);
         g_output.output_file = NULL;
     }
@@ -206,10 +279,11 @@ void signal_handler(int signum) {
     keep_running = 0;
     cleanup_needed = 1;
     
-    char signal_msg[MAX_LINE_LENGTH];
-    snprintf(signal_msg, sizeof(signal_msg), "Received signal %d", signum);
-    log_message(signal_msg, "info");
-    
+    log_messagef("info", "Received signal %d", signum);
+    if (log_fp) {
+        fflush(log_fp);
+    }
+
     if (signum == SIGINT || signum == SIGTERM) {
         printf("\n%sOperation cancelled by user%s\n", FG_YELLOW, RESET);
     }
@@ -222,9 +296,34 @@ void alarm_handler(int signum) {
     cleanup_needed = 1;
 }
 
+/* Install handlers via sigaction so registration is done exactly once
+ * with BSD semantics: the handler stays installed after delivery and
+ * no SA_RESTART, so blocking reads return instead of resuming */
+void setup_signal_handlers(void) {
+    struct sigaction sa;
+    memset(&sa, 0, sizeof(sa));
+    sa.sa_handler = signal_handler;
+    sigemptyset(&sa.sa_mask);
+    sigaction(SIGINT, &sa, NULL);
+    sigaction(SIGTERM, &sa, NULL);
+    // A vanishing terminal or a quit should tear down like SIGTERM
+    // does, not leave the lock file and temp files behind
+    sigaction(SIGHUP, &sa, NULL);
+    sigaction(SIGQUIT, &sa, NULL);
+
+    sa.sa_handler = alarm_handler;
+    sigaction(SIGALRM, &sa, NULL);
+
+    sa.sa_handler = winch_handler;
+    sa.sa_flags = SA_RESTART;
+    sigaction(SIGWINCH, &sa, NULL);
+}
+
 /* File Operations */
 int create_lock_file() {
-    lock_fd = open(LOCK_FILE, O_CREAT | O_EXCL | O_RDWR, 0644);
+    // O_CLOEXEC keeps the lock out of the pacman/apt children we spawn;
+    // a long-running child must not hold the lock past our own exit
+    lock_fd = open(LOCK_FILE, O_CREAT | O_EXCL | O_RDWR | O_CLOEXEC, 0644);
     if (lock_fd < 0) {
         if (errno == EEXIST) {
             fprintf(stderr, "%sAnother instance is already running%s\n", FG_RED, RESET);
@@ -244,17 +343,43 @@ void release_lock_file() {
 }
 
 /* Logging System */
+
+/* Severity ranks for threshold comparison; unknown strings rank lowest
+ * so a typoed level is visible rather than silently dropped */
+static int log_level_rank(const char* level) {
+    if (strcmp(level, "error") == 0) return 3;
+    if (strcmp(level, "warning") == 0) return 2;
+    if (strcmp(level, "info") == 0) return 1;
+    return 0;
+}
+
+// Records below this rank are dropped before any formatting happens
+static int log_threshold = 0;
+
 void initialize_logging() {
-    if (access(LOG_FILE, F_OK) == 0) {
+    const char* level_env = getenv("BLACKUTILITY_LOG_LEVEL");
+    if (level_env) {
+        log_threshold = log_level_rank(level_env);
+    }
+
+    // Rotate on size rather than on every start: short runs keep
+    // appending to one file and stop churning inodes, and the history
+    // in the backup spans more than a single previous invocation
+    struct stat log_stat;
+    if (stat(LOG_FILE, &log_stat) == 0 && log_stat.st_size >= MAX_LOG_SIZE) {
         rename(LOG_FILE, BACKUP_LOG);
     }
-    
-    log_fp = fopen(LOG_FILE, "w");
+
+    log_fp = fopen(LOG_FILE, "ae");
     if (!log_fp) {
         perror("Failed to open log file");
         return;
     }
-    
+
+    // Batch log writes instead of issuing a write() per record; errors
+    // are flushed immediately in log_message so they are never lost
+    setvbuf(log_fp, NULL, _IOFBF, LOG_BUFFER_SIZE);
+
     chmod(LOG_FILE, 0644);
 }
 
@@ -266,23 +391,72 @@ void cleanup_logging() {
 }
 
 void log_message(const char* message, const char* level) {
-    if (!log_fp) return;
+    if (!log_fp || log_level_rank(level) < log_threshold) return;
+
+    // The timestamp only has one-second resolution, so reformat it only
+    // when the clock ticks; bursts of log lines share the cached string
+    static time_t last_stamp = (time_t)-1;
+    static char timestamp[26];
+    time_t now = time(NULL);
+    if (now != last_stamp) {
+        ctime_r(&now, timestamp);
+        timestamp[24] = '\0';
+        last_stamp = now;
+    }
 
-    time_t now;
-    char timestamp[26];
-    time(&now);
-    ctime_r(&now, timestamp);
-    timestamp[24] = '\0';
-    
     fprintf(log_fp, "[%s] [%s] %s\n", timestamp, level, message);
-    fflush(log_fp);
+    if (strcmp(level, "error") == 0) {
+        fflush(log_fp);
+    }
+}
+
+/* The log is fully buffered and only forced out on errors; callers at
+ * natural boundaries can push the buffer without reopening anything */
+void log_flush(void) {
+    if (log_fp) {
+        fflush(log_fp);
+    }
+}
+
+/* Formatted variant that skips the formatting work entirely when the
+ * log is closed; callers no longer stage messages in their own buffers */
+void log_messagef(const char* level, const char* format, ...) {
+    // Check the threshold here as well so filtered records never pay
+    // for the vsnprintf, not just the write
+    if (!log_fp || log_level_rank(level) < log_threshold) return;
+
+    char message[MAX_LINE_LENGTH];
+    va_list args;
+    va_start(args, format);
+    vsnprintf(message, sizeof(message), format, args);
+    va_end(args);
+
+    log_message(message, level);
 }
 
 /* UI Helper Functions */
+static volatile sig_atomic_t terminal_resized = 1;
+
+void winch_handler(int signum) {
+    (void)signum;
+    terminal_resized = 1;
+}
+
+/* The width only changes on SIGWINCH, so cache the ioctl answer and
+ * refresh it when the handler flags a resize instead of asking the
+ * kernel on every box or progress frame */
 void get_terminal_width(int* width) {
-    struct winsize w;
-    ioctl(STDOUT_FILENO, TIOCGWINSZ, &w);
-    *width = w.ws_col;
+    static int cached_width = 80;
+
+    if (terminal_resized) {
+        struct winsize w;
+        if (ioctl(STDOUT_FILENO, TIOCGWINSZ, &w) == 0 && w.ws_col > 0) {
+            cached_width = w.ws_col;
+        }
+        terminal_resized = 0;
+    }
+
+    *width = cached_width;
 }
 
 void print_modern_box(const char* text, const char* color, const char* symbol) {
@@ -311,39 +485,87 @@ void print_modern_box(const char* text, const char* color, const char* symbol) {
 void show_smooth_progress(const char* package, float percentage) {
     static int last_percentage = -1;
     int current_percentage = (int)percentage;
-    
+
+    // The carriage-return redraw trick only makes sense on a terminal
+    if (!stdout_is_tty) {
+        return;
+    }
+
     if (current_percentage == last_percentage && package == NULL) {
         return;
     }
+
+    // Rate-limit terminal redraws; at thousands of packages an update
+    // per completion floods the TTY with escape sequences
+    static struct timespec last_draw = {0, 0};
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    long elapsed_ms = (now.tv_sec - last_draw.tv_sec) * 1000 +
+                      (now.tv_nsec - last_draw.tv_nsec) / 1000000;
+    if (percentage < 100.0 && elapsed_ms < LOADER_UPDATE_INTERVAL / 1000) {
+        return;
+    }
+    last_draw = now;
     last_percentage = current_percentage;
     
-    printf("\r\033[K");
-    printf("%s%s%s ", FG_CYAN, SYMBOL_INSTALL, RESET);
-    
+    // Assemble the whole frame in a buffer and hand it to stdio in one
+    // write; drawing cell by cell issued dozens of tiny writes per frame
+    char frame[OUTPUT_BUFFER_SIZE];
+    size_t off = 0;
+
+    off += snprintf(frame + off, sizeof(frame) - off,
+            "\r\033[K%s%s%s ", FG_CYAN, SYMBOL_INSTALL, RESET);
+
     if (package) {
-        printf("%-30.30s ", package);
+        off += snprintf(frame + off, sizeof(frame) - off, "%-30.30s ", package);
     }
-    
-    printf("[");
+
+    off += snprintf(frame + off, sizeof(frame) - off, "[");
     int bar_width = PROGRESS_BAR_WIDTH;
     int filled = (int)((percentage * bar_width) / 100.0);
-    
+
     for (int i = 0; i < bar_width; i++) {
         if (i < filled) {
-            printf("%s%s", FG_CYAN, BLOCK_FULL);
+            off += snprintf(frame + off, sizeof(frame) - off, "%s%s", FG_CYAN, BLOCK_FULL);
         } else if (i == filled) {
-            printf("%s%s", FG_CYAN, BLOCK_MEDIUM);
+            off += snprintf(frame + off, sizeof(frame) - off, "%s%s", FG_CYAN, BLOCK_MEDIUM);
         } else {
-            printf("%s%s", DIM, BLOCK_LIGHT);
+            off += snprintf(frame + off, sizeof(frame) - off, "%s%s", DIM, BLOCK_LIGHT);
         }
     }
-    
-    printf("%s] %3d%%", RESET, current_percentage);
-    
-    static char spinner[] = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏";
+
+    off += snprintf(frame + off, sizeof(frame) - off, "%s] %3d%%", RESET, current_percentage);
+
+    // Derive an ETA from real completions so the bar reflects actual
+    // throughput instead of stalling on the slowest package. The
+    // monotonic clock keeps the math sane across NTP steps and DST
+    // jumps, which long installs are exposed to
+    static time_t progress_start = 0;
+    struct timespec eta_now;
+    clock_gettime(CLOCK_MONOTONIC, &eta_now);
+    if (percentage <= 0.0) {
+        progress_start = eta_now.tv_sec;
+    } else if (progress_start > 0 && percentage < 100.0) {
+        time_t elapsed = eta_now.tv_sec - progress_start;
+        if (elapsed > 0 && percentage >= 1.0) {
+            long remaining = (long)(elapsed * (100.0 - percentage) / percentage);
+            off += snprintf(frame + off, sizeof(frame) - off,
+                    " %s%ldm%02lds left%s", DIM, remaining / 60, remaining % 60, RESET);
+        }
+    }
+
+    // One frame per entry: the braille glyphs are three UTF-8 bytes each,
+    // so byte-indexing the old string emitted garbage and recomputed its
+    // length on every redraw
+    static const char* const spinner[] = {
+        "⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"
+    };
+    static const int spinner_frames = (int)(sizeof(spinner) / sizeof(spinner[0]));
     static int spinner_pos = 0;
-    printf(" %s%c%s", FG_CYAN, spinner[spinner_pos++ % strlen(spinner)], RESET);
-    
+    snprintf(frame + off, sizeof(frame) - off,
+            " %s%s%s", FG_CYAN, spinner[spinner_pos++ % spinner_frames], RESET);
+
+    fputs(frame, stdout);
     fflush(stdout);
 }
 
@@ -352,62 +574,190 @@ int check_root_privileges(void) {
     return (geteuid() == 0);
 }
 
+/* Bounded TCP probe: a SYN round-trip is enough to know the network is
+ * up, without fetching anything or waiting on a slow HTTP server */
+int tcp_probe_start(const char* ip, int port) {
+    int fd = socket(AF_INET, SOCK_STREAM, 0);
+    if (fd < 0) {
+        return -1;
+    }
+    fcntl(fd, F_SETFL, O_NONBLOCK);
+
+    struct sockaddr_in addr;
+    memset(&addr, 0, sizeof(addr));
+    addr.sin_family = AF_INET;
+    addr.sin_port = htons(port);
+    inet_pton(AF_INET, ip, &addr.sin_addr);
+
+    if (connect(fd, (struct sockaddr*)&addr, sizeof(addr)) != 0 &&
+        errno != EINPROGRESS) {
+        close(fd);
+        return -1;
+    }
+
+    return fd;
+}
+
+/* Race connects to several well-known resolvers; one unreachable host
+ * must not make us report the whole network as down */
+static const char* const PROBE_HOSTS[] = {
+    "8.8.8.8", "1.1.1.1", "9.9.9.9", NULL
+};
+
+typedef struct {
+    int fds[4];
+    int count;
+} NetProbe;
+
+void net_probe_start(NetProbe* probe) {
+    probe->count = 0;
+    for (int i = 0; PROBE_HOSTS[i] &&
+         probe->count < (int)(sizeof(probe->fds) / sizeof(probe->fds[0])); i++) {
+        int fd = tcp_probe_start(PROBE_HOSTS[i], 53);
+        if (fd >= 0) {
+            probe->fds[probe->count++] = fd;
+        }
+    }
+}
+
+void net_probe_abort(NetProbe* probe) {
+    for (int i = 0; i < probe->count; i++) {
+        close(probe->fds[i]);
+    }
+    probe->count = 0;
+}
+
+int net_probe_finish(NetProbe* probe, int timeout_ms) {
+    struct timespec start;
+    clock_gettime(CLOCK_MONOTONIC, &start);
+
+    int ok = 0;
+    while (probe->count > 0 && !ok) {
+        fd_set wfds;
+        FD_ZERO(&wfds);
+        int maxfd = -1;
+        for (int i = 0; i < probe->count; i++) {
+            FD_SET(probe->fds[i], &wfds);
+            if (probe->fds[i] > maxfd) {
+                maxfd = probe->fds[i];
+            }
+        }
+
+        struct timespec now;
+        clock_gettime(CLOCK_MONOTONIC, &now);
+        long remaining_ms = timeout_ms -
+            ((now.tv_sec - start.tv_sec) * 1000 +
+             (now.tv_nsec - start.tv_nsec) / 1000000);
+        if (remaining_ms <= 0) {
+            break;
+        }
+
+        struct timeval tv = { remaining_ms / 1000, (remaining_ms % 1000) * 1000 };
+        if (select(maxfd + 1, NULL, &wfds, NULL, &tv) <= 0) {
+            break;
+        }
+
+        // First successful handshake wins; refused connects are dropped
+        // from the set and we keep waiting on the rest
+        for (int i = 0; i < probe->count; ) {
+            if (!FD_ISSET(probe->fds[i], &wfds)) {
+                i++;
+                continue;
+            }
+            int err = 0;
+            socklen_t len = sizeof(err);
+            getsockopt(probe->fds[i], SOL_SOCKET, SO_ERROR, &err, &len);
+            if (err == 0) {
+                ok = 1;
+                break;
+            }
+            close(probe->fds[i]);
+            probe->fds[i] = probe->fds[--probe->count];
+        }
+    }
+
+    net_probe_abort(probe);
+    return ok;
+}
+
+int check_internet_connection(void) {
+    // Connectivity does not flip fast enough to justify a fresh TCP
+    // round trip per caller; remember the last answer for 30 seconds
+    static struct timespec last_check;
+    static int last_ok = 0;
+    static int have_result = 0;
+
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    if (have_result && now.tv_sec - last_check.tv_sec < 30) {
+        return last_ok;
+    }
+
+    NetProbe probe;
+    net_probe_start(&probe);
+    last_ok = net_probe_finish(&probe, 2000);
+    last_check = now;
+    have_result = 1;
+    return last_ok;
+}
+
 int check_system_requirements(void) {
+    // Kick the connectivity probes off first so the TCP handshakes are
+    // in flight while the local disk and RAM checks run; by the time we
+    // harvest them the round trips have usually already completed
+    NetProbe probe;
+    net_probe_start(&probe);
+
     struct statvfs fs_stats;
     if (statvfs("/", &fs_stats) != 0) {
         log_message("Failed to check disk space", "error");
+        net_probe_abort(&probe);
         return 0;
     }
     
-    unsigned long long available_space = fs_stats.f_bsize * fs_stats.f_bavail;
+    // f_frsize is the fundamental block size the counts are expressed
+    // in; f_bsize is only the preferred I/O size and overstates free
+    // space on filesystems where the two differ
+    unsigned long long available_space =
+        (unsigned long long)fs_stats.f_frsize * fs_stats.f_bavail;
     if (available_space < MIN_DISK_SPACE) {
-        char space_msg[MAX_LINE_LENGTH];
-        snprintf(space_msg, sizeof(space_msg),
-                "Insufficient disk space. Required: %.2f GB, Available: %.2f GB",
-                (double)MIN_DISK_SPACE / (1024*1024*1024),
-                (double)available_space / (1024*1024*1024));
-        log_message(space_msg, "error");
+        log_messagef("error",
+                "Insufficient disk space. Required: %llu GB, Available: %llu GB",
+                MIN_DISK_SPACE / BYTES_PER_GB,
+                available_space / BYTES_PER_GB);
+        net_probe_abort(&probe);
         return 0;
     }
     
     struct sysinfo si;
     if (sysinfo(&si) != 0) {
         log_message("Failed to check system memory", "error");
+        net_probe_abort(&probe);
         return 0;
     }
     
     unsigned long total_ram_mb = (si.totalram * si.mem_unit) / (1024*1024);
     if (total_ram_mb < MIN_RAM) {
-        char ram_msg[MAX_LINE_LENGTH];
-        snprintf(ram_msg, sizeof(ram_msg),
-                "Insufficient RAM. Required: %d MB, Available: %lu MB",
+        log_messagef("error", "Insufficient RAM. Required: %d MB, Available: %lu MB",
                 MIN_RAM, total_ram_mb);
-        log_message(ram_msg, "error");
+        net_probe_abort(&probe);
         return 0;
     }
     
-    // Check if running on Arch Linux
-    FILE* os_release = fopen("/etc/os-release", "r");
-    if (!os_release) {
-        log_message("Failed to check OS type", "error");
+    if (!net_probe_finish(&probe, 2000)) {
+        log_message("No internet connection detected", "error");
         return 0;
     }
-    
-    char line[MAX_LINE_LENGTH];
-    int is_arch = 0;
-    while (fgets(line, sizeof(line), os_release)) {
-        if (strstr(line, "ID=arch")) {
-            is_arch = 1;
-            break;
-        }
-    }
-    fclose(os_release);
-    
-    if (!is_arch) {
-        log_message("This utility requires Arch Linux", "error");
+
+    // Reuse the memoized detection instead of re-parsing /etc/os-release
+    // with a second, stricter scanner; the old inline check also rejected
+    // Debian-based systems the rest of the program happily supports
+    if (detect_system_type() == SYSTEM_UNKNOWN) {
+        log_message("This utility requires Arch Linux or a Debian-based system",
+                   "error");
         return 0;
     }
-    
+
     return 1;
 }
 
@@ -419,7 +769,27 @@ void str_to_upper(char* str) {
 }
 
 /* System Detection Functions */
+SystemType classify_os_id(const char* id) {
+    if (strcmp(id, "arch") == 0 || strcmp(id, "blackarch") == 0 ||
+        strcmp(id, "archarm") == 0) {
+        return SYSTEM_ARCH;
+    }
+    if (strcmp(id, "debian") == 0 || strcmp(id, "ubuntu") == 0 ||
+        strcmp(id, "kali") == 0 || strcmp(id, "parrot") == 0) {
+        return SYSTEM_DEBIAN;
+    }
+    return SYSTEM_UNKNOWN;
+}
+
 SystemType detect_system_type() {
+    // The OS does not change mid-run; parse os-release once and hand
+    // out the cached answer to every later caller
+    static SystemType cached_type = SYSTEM_UNKNOWN;
+    static int detection_done = 0;
+    if (detection_done) {
+        return cached_type;
+    }
+
     FILE* os_release = fopen("/etc/os-release", "r");
     if (!os_release) {
         log_message("Failed to detect OS type", "error");
@@ -429,49 +799,285 @@ SystemType detect_system_type() {
     char line[MAX_LINE_LENGTH];
     SystemType type = SYSTEM_UNKNOWN;
 
-    while (fgets(line, sizeof(line), os_release)) {
-        if (strstr(line, "ID=arch")) {
-            type = SYSTEM_ARCH;
-            break;
-        } else if (strstr(line, "ID=debian") || strstr(line, "ID=ubuntu") || 
-                   strstr(line, "ID=kali") || strstr(line, "ID=parrot")) {
-            type = SYSTEM_DEBIAN;
-            break;
+    // Compare the ID/ID_LIKE values themselves rather than substring
+    // matching whole lines, so entries like ID=architect cannot match
+    // and derivatives listing a parent distro in ID_LIKE are recognized
+    while (fgets(line, sizeof(line), os_release) && type == SYSTEM_UNKNOWN) {
+        char* value;
+        if (strncmp(line, "ID=", 3) == 0) {
+            value = line + 3;
+        } else if (strncmp(line, "ID_LIKE=", 8) == 0) {
+            value = line + 8;
+        } else {
+            continue;
+        }
+
+        line[strcspn(line, "\n")] = 0;
+        char* token = strtok(value, " \"");
+        while (token) {
+            type = classify_os_id(token);
+            if (type != SYSTEM_UNKNOWN) {
+                break;
+            }
+            token = strtok(NULL, " \"");
         }
     }
-    
+
     fclose(os_release);
+    cached_type = type;
+    detection_done = 1;
     return type;
 }
 
-int setup_kali_repository() {
-    log_message("Setting up Kali Linux repository...", "info");
-
-    char wget_cmd[MAX_CMD_LENGTH];
-    snprintf(wget_cmd, sizeof(wget_cmd), 
-            "wget -q %s -O %s", KALI_KEYRING_URL, TEMP_KEYRING_DEB);
-    
-    if (!execute_command(wget_cmd)) {
-        log_message("Failed to download Kali keyring", "error");
+/* Size and magic come off one descriptor: open once, fstat, read.
+ * A separate stat-by-path would repeat the directory lookup and leave
+ * a window where the checked file and the opened file differ */
+static int keyring_deb_looks_valid(const char* path) {
+    int fd = open(path, O_RDONLY | O_CLOEXEC);
+    if (fd < 0) {
         return 0;
     }
 
-    if (!execute_command("dpkg -i " TEMP_KEYRING_DEB)) {
-        log_message("Failed to install Kali keyring", "error");
+    // A failed or intercepted download (captive portal, proxy error
+    // page) is typically a short HTML document; the real keyring
+    // package is tens of kilobytes
+    struct stat st;
+    if (fstat(fd, &st) != 0 || st.st_size < 1024) {
+        close(fd);
         return 0;
     }
 
+    // A .deb is an ar archive; checking the magic catches a served
+    // error page that happens to clear the size bar
+    char magic[8];
+    ssize_t n = read(fd, magic, sizeof(magic));
+    close(fd);
+    return n == (ssize_t)sizeof(magic) && memcmp(magic, "!<arch>\n", 8) == 0;
+}
+
+/* Download the keyring and digest it in the same pass: curl streams into
+ * tee, which writes the file while sha256sum consumes the copy, so the
+ * bytes are never re-read from disk just to be hashed. Upstream rotates
+ * keyring releases, so there is no pinned value to compare against; the
+ * digest is logged so a suspect install can be audited after the fact.
+ * sha256sum hashes in large blocks through its crypto library, which
+ * dispatches to hardware SHA extensions where present, so there is no
+ * faster path worth reimplementing in-process */
+/* Mirror race, same start/finish shape as NetProbe: one curl child per
+ * mirror, each streaming through tee and sha256sum into its own tmp
+ * path so writers never collide. The first child whose file validates
+ * wins; the rest are killed. Cold-start latency becomes the fastest
+ * mirror's instead of the sum of every dead one's timeout */
+typedef struct {
+    pid_t pids[4];
+    int count;
+} KeyringRace;
+
+static void keyring_race_path(int idx, char* buf, size_t size) {
+    snprintf(buf, size, "%s.%d", TEMP_KEYRING_DEB, idx);
+}
+
+static void keyring_race_start(KeyringRace* race) {
+    int max = (int)(sizeof(race->pids) / sizeof(race->pids[0]));
+    race->count = 0;
+
+    for (int i = 0; KALI_KEYRING_MIRRORS[i] != NULL && race->count < max; i++) {
+        char path[64];
+        char stale_ok[72];
+        char cmd[MAX_CMD_LENGTH];
+        keyring_race_path(i, path, sizeof(path));
+
+        // A marker left by an earlier crashed run must not vouch for
+        // this run's transfer
+        snprintf(stale_ok, sizeof(stale_ok), "%s.ok", path);
+        unlink(stale_ok);
+
+        // No --retry here: curl cannot rewind a pipe, so a retry after
+        // a mid-body failure would append a second body behind the
+        // partial one and tee would write out the concatenation. The
+        // mirror race itself is the retry mechanism for this fetch.
+        // The pipeline's exit status is sha256sum's, which is 0 even
+        // when curl fails; the .ok marker carries curl's own verdict
+        // out to the parent
+        snprintf(cmd, sizeof(cmd),
+                "{ curl -fsSL --compressed --connect-timeout 5 "
+                "--max-filesize 10M "
+                "--max-time 120 %s && touch %s.ok; } "
+                "| tee %s | sha256sum > %s.digest",
+                KALI_KEYRING_MIRRORS[i], path, path, path);
+
+        pid_t pid = fork();
+        if (pid == 0) {
+            // Own process group so killing a loser takes its whole
+            // pipeline down, not just the shell
+            setpgid(0, 0);
+            execl("/bin/sh", "sh", "-c", cmd, (char*)NULL);
+            _exit(127);
+        }
+        race->pids[race->count++] = pid;
+    }
+}
+
+static void log_keyring_digest(const char* digest_path) {
+    FILE* f = fopen(digest_path, "re");
+    if (!f) {
+        return;
+    }
+    char digest[MAX_LINE_LENGTH];
+    if (fgets(digest, sizeof(digest), f)) {
+        digest[strcspn(digest, " \n")] = '\0';
+        log_messagef("info", "Kali keyring sha256: %.64s", digest);
+    }
+    fclose(f);
+}
+
+static void keyring_race_kill_remaining(KeyringRace* race) {
+    for (int i = 0; i < race->count; i++) {
+        if (race->pids[i] > 0) {
+            kill(-race->pids[i], SIGTERM);
+            waitpid(race->pids[i], NULL, 0);
+            race->pids[i] = -1;
+        }
+    }
+}
+
+/* Reap children until one produced a valid keyring (or all are gone),
+ * kill the rest, promote the winner's file and log its digest */
+static int keyring_race_finish(KeyringRace* race) {
+    int winner = -1;
+    int remaining = 0;
+    for (int i = 0; i < race->count; i++) {
+        if (race->pids[i] > 0) {
+            remaining++;
+        }
+    }
+
+    while (remaining > 0 && winner < 0) {
+        int status;
+        pid_t done = wait(&status);
+        if (done < 0) {
+            break;
+        }
+
+        int idx = -1;
+        for (int i = 0; i < race->count; i++) {
+            if (race->pids[i] == done) {
+                idx = i;
+                break;
+            }
+        }
+        if (idx < 0) {
+            continue;
+        }
+        race->pids[idx] = -1;
+        remaining--;
+
+        char path[64];
+        char ok_path[72];
+        keyring_race_path(idx, path, sizeof(path));
+        snprintf(ok_path, sizeof(ok_path), "%s.ok", path);
+        if (WIFEXITED(status) && WEXITSTATUS(status) == 0 &&
+            access(ok_path, F_OK) == 0 &&
+            keyring_deb_looks_valid(path)) {
+            winner = idx;
+        } else {
+            log_messagef("warning", "Keyring download failed from %.120s",
+                    KALI_KEYRING_MIRRORS[idx]);
+        }
+    }
+
+    keyring_race_kill_remaining(race);
+
+    for (int i = 0; i < race->count; i++) {
+        char path[64];
+        char side_path[72];
+        keyring_race_path(i, path, sizeof(path));
+        snprintf(side_path, sizeof(side_path), "%s.digest", path);
+        if (i == winner) {
+            log_keyring_digest(side_path);
+            rename(path, TEMP_KEYRING_DEB);
+        } else {
+            unlink(path);
+        }
+        unlink(side_path);
+        snprintf(side_path, sizeof(side_path), "%s.ok", path);
+        unlink(side_path);
+    }
+    return winner >= 0;
+}
+
+static void keyring_race_abort(KeyringRace* race) {
+    keyring_race_kill_remaining(race);
+    for (int i = 0; i < race->count; i++) {
+        char path[64];
+        char side_path[72];
+        keyring_race_path(i, path, sizeof(path));
+        unlink(path);
+        snprintf(side_path, sizeof(side_path), "%s.digest", path);
+        unlink(side_path);
+        snprintf(side_path, sizeof(side_path), "%s.ok", path);
+        unlink(side_path);
+    }
+}
+
+int setup_kali_repository() {
+    // Only skip setup when both halves of a previous run are present:
+    // the sources entry and the keyring the package it installs ships.
+    // The sources file alone (stale, or written by hand) proves
+    // nothing about the keyring, and taking the skip without it wedges
+    // every run at apt-get update. Same idea as the Arch path probing
+    // pacman-key for the key itself rather than the repo line
+    if (access(KALI_SOURCES_FILE, F_OK) == 0 &&
+        access(KALI_KEYRING_GPG, F_OK) == 0) {
+        log_message("Kali repository already configured", "info");
+        if (!execute_command("apt-get update")) {
+            log_message("Failed to update package lists", "error");
+            return 0;
+        }
+        return 1;
+    }
+
+    log_message("Setting up Kali Linux repository...", "info");
+
+    // Launch every mirror's transfer at once, do the local sources
+    // write while the bytes move, then collect the first valid result.
+    // The sources entry has to exist before apt-get update anyway, so
+    // the write is free wait-time work; it also lets the keyring
+    // install and the list refresh share one shell, with dpkg failing
+    // still short-circuiting the update
+    KeyringRace race;
+    keyring_race_start(&race);
+
     FILE* sources = fopen(KALI_SOURCES_FILE, "w");
     if (!sources) {
         log_message("Failed to create Kali sources file", "error");
+        keyring_race_abort(&race);
         return 0;
     }
-
     fprintf(sources, "%s\n", KALI_REPO_LINE);
     fclose(sources);
 
-    if (!execute_command("apt-get update")) {
-        log_message("Failed to update package lists", "error");
+    // The sources entry was written optimistically while the download
+    // ran; if setup fails from here on it must be rolled back, or apt
+    // is left pointing at a repo it cannot authenticate and every
+    // apt-get update on the machine breaks, not just this tool
+    if (!keyring_race_finish(&race)) {
+        log_message("Failed to download Kali keyring", "error");
+        unlink(KALI_SOURCES_FILE);
+        unlink(TEMP_KEYRING_DEB);
+        return 0;
+    }
+
+    char keyring_cmd[MAX_CMD_LENGTH];
+
+    snprintf(keyring_cmd, sizeof(keyring_cmd),
+            "dpkg -i %s && apt-get update", TEMP_KEYRING_DEB);
+    int setup_ok = execute_command(keyring_cmd);
+    unlink(TEMP_KEYRING_DEB);
+
+    if (!setup_ok) {
+        log_message("Failed to install keyring or update package lists", "error");
+        unlink(KALI_SOURCES_FILE);
         return 0;
     }
 
@@ -489,10 +1095,7 @@ int execute_command(const char* command) {
     if (WIFEXITED(status)) {
         int exit_status = WEXITSTATUS(status);
         if (exit_status != 0) {
-            char error_msg[MAX_LINE_LENGTH];
-            snprintf(error_msg, sizeof(error_msg), 
-                    "Command failed with exit status: %d", exit_status);
-            log_message(error_msg, "error");
+            log_messagef("error", "Command failed with exit status: %d", exit_status);
             return 0;
         }
     }
@@ -500,166 +1103,952 @@ int execute_command(const char* command) {
     return 1;
 }
 
-int generate_tool_list(void) {
-    SystemType sys_type = detect_system_type();
-    
-    switch (sys_type) {
-        case SYSTEM_ARCH:
-            log_message("Setting up BlackArch repository...", "info");
-            
-            if (!execute_command("grep -q '\\[blackarch\\]' /etc/pacman.conf")) {
-                const char* repo_cmd = "echo -e '[blackarch]\\nServer = https://blackarch.org/blackarch/$repo/os/$arch' >> /etc/pacman.conf";
-                if (!execute_command(repo_cmd)) {
-                    log_message("Failed to add BlackArch repository", "error");
-                    return 0;
-                }
-                
-                if (!execute_command("pacman-key --recv-key 4345771566D76038C7FEB43863EC0ADBEA87E4E3 && "
-                                   "pacman-key --lsign-key 4345771566D76038C7FEB43863EC0ADBEA87E4E3")) {
-                    log_message("Failed to install BlackArch keyring", "error");
-                    return 0;
-                }
-            }
-            
-            if (!execute_command("pacman -Sy")) {
-                log_message("Failed to update package database", "error");
-                return 0;
-            }
-            
-            if (!execute_command("pacman -Sg | grep -i security > " TEMP_FILE)) {
-                log_message("Failed to generate tool list", "error");
-                return 0;
-            }
-            break;
-            
-        case SYSTEM_DEBIAN:
-            if (!setup_kali_repository()) {
-                return 0;
-            }
-            
-            FILE* tool_file = fopen(TEMP_FILE, "w");
-            if (!tool_file) {
-                log_message("Failed to create tool list", "error");
-                return 0;
-            }
-            
-            const char* categories[] = {
-                "information-gathering", "vulnerability-analysis", 
-                "wireless-attacks", "web-applications", "exploitation-tools",
-                "forensics-tools", "stress-testing", "password-attacks",
-                "reverse-engineering", "sniffing-spoofing", NULL
-            };
-            
-            for (int i = 0; categories[i] != NULL; i++) {
-                char cmd[MAX_CMD_LENGTH];
-                snprintf(cmd, sizeof(cmd),
-                        "apt-cache search '%s' | grep -i 'kali' >> " TEMP_FILE,
-                        categories[i]);
-                execute_command(cmd);
-            }
-            
-            fclose(tool_file);
-            break;
-            
-        default:
-            log_message("Unsupported system type", "error");
-            return 0;
+int copy_file(const char* src, const char* dst) {
+    // When src and dst share a filesystem a hard link is a metadata-only
+    // copy; both files are only ever replaced via rename, so the shared
+    // inode is never rewritten in place. Cross-device pairs fail with
+    // EXDEV and take the byte copy below
+    unlink(dst);
+    if (link(src, dst) == 0) {
+        return 1;
     }
-    
-    return 1;
-}
 
-void install_tools(void) {
-    SystemType sys_type = detect_system_type();
-    if (sys_type == SYSTEM_UNKNOWN) {
-        log_message("Unsupported system type", "error");
-        return;
+    int in = open(src, O_RDONLY | O_CLOEXEC);
+    if (in < 0) {
+        return 0;
     }
+    // One front-to-back pass: double the readahead window up front
+    posix_fadvise(in, 0, 0, POSIX_FADV_SEQUENTIAL);
 
-    g_progress.completed_packages = 0;
-    g_progress.show_details = 0;
+    int out = open(dst, O_WRONLY | O_CREAT | O_TRUNC | O_CLOEXEC, 0644);
+    if (out < 0) {
+        close(in);
+        return 0;
+    }
+
+    // sendfile moves the bytes kernel-side, skipping the read/write
+    // bounce through a userspace buffer entirely
+    int ok = 1;
+    for (;;) {
+        ssize_t sent = sendfile(out, in, NULL, PIPE_BUFFER_SIZE);
+        if (sent == 0) {
+            break;
+        }
+        if (sent < 0) {
+            ok = 0;
+            break;
+        }
+    }
+
+    close(in);
+    if (close(out) != 0) {
+        ok = 0;
+    }
+    return ok;
+}
+
+/* Queue asynchronous readahead for every file under a directory tree.
+ * POSIX_FADV_WILLNEED returns immediately, so this costs one quick pass
+ * of opens while the kernel pulls the data into the page cache in the
+ * background — by the time pacman walks its sync DB the pages are warm */
+void warm_file_tree(const char* root) {
+    DIR* dir = opendir(root);
+    if (!dir) {
+        return;
+    }
+
+    struct dirent* entry;
+    while ((entry = readdir(dir))) {
+        if (entry->d_name[0] == '.') {
+            continue;
+        }
+
+        char path[PATH_MAX];
+        snprintf(path, sizeof(path), "%s/%s", root, entry->d_name);
+
+        struct stat st;
+        if (stat(path, &st) != 0) {
+            continue;
+        }
+        if (S_ISDIR(st.st_mode)) {
+            warm_file_tree(path);
+        } else if (S_ISREG(st.st_mode)) {
+            int fd = open(path, O_RDONLY | O_CLOEXEC);
+            if (fd >= 0) {
+                posix_fadvise(fd, 0, 0, POSIX_FADV_WILLNEED);
+                close(fd);
+            }
+        }
+    }
+    closedir(dir);
+}
+
+/* The generated tool list only changes when the package database does,
+ * so keep a cached copy keyed by the database's mtime and skip the
+ * expensive scan when nothing changed. On Arch the reference is the
+ * BlackArch sync DB; on Debian it is the apt lists directory, whose
+ * mtime moves whenever apt-get update fetches new indexes */
+int tool_cache_is_fresh(SystemType sys_type) {
+    const char* db_path = (sys_type == SYSTEM_ARCH)
+            ? BLACKARCH_SYNC_DB : "/var/lib/apt/lists";
+    const char* conf_path = (sys_type == SYSTEM_ARCH)
+            ? "/etc/pacman.conf" : KALI_SOURCES_FILE;
+
+    struct stat cache_stat, db_stat, conf_stat;
+    if (stat(TOOL_CACHE_FILE, &cache_stat) != 0 || stat(db_path, &db_stat) != 0) {
+        return 0;
+    }
+    if (cache_stat.st_mtime < db_stat.st_mtime) {
+        return 0;
+    }
+    // An edited repo configuration changes what the scan would return,
+    // so it invalidates the cache as well
+    if (stat(conf_path, &conf_stat) == 0 &&
+        cache_stat.st_mtime < conf_stat.st_mtime) {
+        return 0;
+    }
+    return 1;
+}
+
+void update_tool_cache(void) {
+    mkdir(TOOL_CACHE_DIR, 0755);
+    // Drop any v1 cache left on disk; its entries predate the
+    // bare-name format and would never match the installed snapshot
+    unlink(TOOL_CACHE_DIR "/tools.list");
+    if (!copy_file(TEMP_FILE, TOOL_CACHE_FILE)) {
+        log_message("Failed to update tool list cache", "warning");
+    }
+}
+
+/* A config lookup does not need a shell and grep; scan pacman.conf for
+ * the [blackarch] section header directly. The parse result is memoized
+ * against the file's mtime so repeat callers within a run (and re-checks
+ * after we append the repo ourselves) only pay a stat */
+int blackarch_repo_configured(void) {
+    static time_t cached_mtime = (time_t)-1;
+    static int cached_found = 0;
+
+    struct stat conf_stat;
+    if (stat("/etc/pacman.conf", &conf_stat) != 0) {
+        return 0;
+    }
+    if (conf_stat.st_mtime == cached_mtime) {
+        return cached_found;
+    }
+
+    FILE* conf = fopen("/etc/pacman.conf", "r");
+    if (!conf) {
+        return 0;
+    }
+
+    char line[MAX_LINE_LENGTH];
+    int found = 0;
+    while (fgets(line, sizeof(line), conf)) {
+        if (strncmp(line, "[blackarch]", 11) == 0) {
+            found = 1;
+            break;
+        }
+    }
+    fclose(conf);
+
+    cached_mtime = conf_stat.st_mtime;
+    cached_found = found;
+    return found;
+}
+
+/* Stream a package listing command and filter it in-process; forking
+ * grep paid a process spawn plus an extra pipe copy of the listing.
+ * The Arch and Debian generators only differ in the command and the
+ * substrings they keep: a line survives if any needle matches, so the
+ * listing is walked exactly once however many patterns there are */
+int generate_filtered_tool_list(const char* cmd, const char* const* needles) {
+    FILE* listing = popen(cmd, "re");
+    if (!listing) {
+        log_message("Failed to list packages", "error");
+        return 0;
+    }
+    setvbuf(listing, NULL, _IOFBF, PIPE_BUFFER_SIZE);
+
+    FILE* out = fopen(TEMP_FILE_TMP, "w");
+    if (!out) {
+        pclose(listing);
+        log_message("Failed to create tool list", "error");
+        return 0;
+    }
+    setvbuf(out, NULL, _IOFBF, PIPE_BUFFER_SIZE);
+
+    char line[MAX_LINE_LENGTH];
+    while (fgets(line, sizeof(line), listing)) {
+        for (int i = 0; needles[i] != NULL; i++) {
+            if (strcasestr(line, needles[i])) {
+                // Match against the whole line (descriptions carry the
+                // category terms) but keep only the leading package
+                // name: apt-cache search prints "pkg - description",
+                // and the install commands and installed-set lookups
+                // need the bare name
+                size_t name_len = strcspn(line, " \t\n");
+                if (name_len > 0) {
+                    fwrite(line, 1, name_len, out);
+                    fputc('\n', out);
+                }
+                break;
+            }
+        }
+    }
+
+    fclose(out);
+    if (pclose(listing) != 0) {
+        log_message("Failed to generate tool list", "error");
+        return 0;
+    }
+    return 1;
+}
+
+/* pacman -Sg emits group names, but everything downstream — the
+ * installed-package skip, the resume state, the post-install
+ * verification — compares against pacman -Qq package names. Expand the
+ * matched groups to their member packages with one pacman -Sgq call so
+ * both sides of those comparisons speak the same vocabulary */
+int expand_arch_groups(void) {
+    int group_count = 0;
+    char** groups = load_tool_list(TEMP_FILE_TMP, &group_count);
+    if (!groups) {
+        return 0;
+    }
+    if (group_count == 0) {
+        free_tool_list(groups, group_count);
+        return 1;
+    }
+
+    size_t cmd_size = sizeof("pacman -Sgq");
+    for (int i = 0; i < group_count; i++) {
+        cmd_size += strlen(groups[i]) + 1;
+    }
+    char* cmd = malloc(cmd_size);
+    if (!cmd) {
+        log_message("Out of memory while expanding package groups", "error");
+        free_tool_list(groups, group_count);
+        return 0;
+    }
+    size_t offset = (size_t)snprintf(cmd, cmd_size, "pacman -Sgq");
+    for (int i = 0; i < group_count; i++) {
+        offset += (size_t)snprintf(cmd + offset, cmd_size - offset, " %s",
+                                   groups[i]);
+    }
+    free_tool_list(groups, group_count);
+
+    FILE* members = popen(cmd, "re");
+    free(cmd);
+    if (!members) {
+        log_message("Failed to expand package groups", "error");
+        return 0;
+    }
+    setvbuf(members, NULL, _IOFBF, PIPE_BUFFER_SIZE);
+
+    // The group list was read whole into memory above, so rewriting the
+    // staging file with the member names is safe
+    FILE* out = fopen(TEMP_FILE_TMP, "w");
+    if (!out) {
+        pclose(members);
+        log_message("Failed to create tool list", "error");
+        return 0;
+    }
+    setvbuf(out, NULL, _IOFBF, PIPE_BUFFER_SIZE);
+
+    char line[MAX_LINE_LENGTH];
+    while (fgets(line, sizeof(line), members)) {
+        fputs(line, out);
+    }
+    fclose(out);
+    if (pclose(members) != 0) {
+        log_message("Failed to expand package groups", "error");
+        return 0;
+    }
+    return 1;
+}
+
+int finalize_tool_list(void) {
+    if (rename(TEMP_FILE_TMP, TEMP_FILE) != 0) {
+        log_message("Failed to finalize tool list", "error");
+        return 0;
+    }
+    return 1;
+}
+
+int generate_tool_list(SystemType sys_type) {
     
-    FILE* tool_list = fopen(TEMP_FILE, "r");
+    switch (sys_type) {
+        case SYSTEM_ARCH:
+            log_message("Setting up BlackArch repository...", "info");
+
+            // Walk the sync DB in a child so its readahead requests run
+            // concurrently with the network-bound repo setup and refresh
+            // below; the child only issues advise calls and exits
+            pid_t warm_pid = fork();
+            if (warm_pid == 0) {
+                warm_file_tree("/var/lib/pacman/sync");
+                _exit(0);
+            }
+
+            // One shell for the whole repo transaction, DB refresh
+            // included: the steps are strictly sequential and any
+            // failure aborts the rest, so there is no reason to pay a
+            // fork per step. The recv/lsign pair only runs when the key
+            // is absent: a rerun after a partial setup (key imported,
+            // repo line lost or vice versa) skips the keyserver
+            // round-trip
+            char sync_cmd[MAX_CMD_LENGTH];
+            if (blackarch_repo_configured()) {
+                snprintf(sync_cmd, sizeof(sync_cmd), "pacman -Sy");
+            } else {
+                // Append the repo section directly rather than through
+                // an echo -e in the shell: -e is not POSIX, so the old
+                // form broke under shells whose echo prints it literally
+                FILE* conf = fopen("/etc/pacman.conf", "ae");
+                if (!conf) {
+                    log_message("Failed to open pacman.conf for the BlackArch repo",
+                               "error");
+                    return 0;
+                }
+                fprintf(conf,
+                        "[blackarch]\nServer = https://blackarch.org/blackarch/$repo/os/$arch\n");
+                fclose(conf);
+
+                snprintf(sync_cmd, sizeof(sync_cmd),
+                    "{ pacman-key --list-keys 4345771566D76038C7FEB43863EC0ADBEA87E4E3 >/dev/null 2>&1 || "
+                    "{ pacman-key --recv-key 4345771566D76038C7FEB43863EC0ADBEA87E4E3 && "
+                    "pacman-key --lsign-key 4345771566D76038C7FEB43863EC0ADBEA87E4E3; }; } && "
+                    "pacman -Sy");
+            }
+            if (!execute_command(sync_cmd)) {
+                log_message("Failed to configure or refresh the BlackArch repository",
+                           "error");
+                return 0;
+            }
+
+            if (warm_pid > 0) {
+                waitpid(warm_pid, NULL, 0);
+            }
+
+            if (tool_cache_is_fresh(sys_type) && copy_file(TOOL_CACHE_FILE, TEMP_FILE)) {
+                log_message("Using cached tool list", "info");
+                break;
+            }
+
+            static const char* const arch_needles[] = { "security", NULL };
+            if (!generate_filtered_tool_list("pacman -Sg", arch_needles) ||
+                !expand_arch_groups() ||
+                !finalize_tool_list()) {
+                return 0;
+            }
+
+            update_tool_cache();
+            break;
+            
+        case SYSTEM_DEBIAN:
+            if (!setup_kali_repository()) {
+                return 0;
+            }
+
+            if (tool_cache_is_fresh(sys_type) && copy_file(TOOL_CACHE_FILE, TEMP_FILE)) {
+                log_message("Using cached tool list", "info");
+                break;
+            }
+
+            // One plain-substring apt-cache pass, then match every
+            // category in-process during the single walk of the output;
+            // the old regex alternation made apt evaluate a ten-branch
+            // pattern against each package instead
+            if (!generate_filtered_tool_list("apt-cache search kali",
+                                             KALI_CATEGORIES) ||
+                !finalize_tool_list()) {
+                return 0;
+            }
+
+            update_tool_cache();
+            break;
+            
+        default:
+            log_message("Unsupported system type", "error");
+            return 0;
+    }
+    
+    return 1;
+}
+
+/* getline grows its buffer to the actual line length, so an oversized
+ * entry is kept whole instead of being split at MAX_LINE_LENGTH and
+ * read back as two bogus package names */
+char** read_name_lines(FILE* stream, int* count) {
+    char** names = NULL;
+    int capacity = 0;
+    int n = 0;
+    char* line = NULL;
+    size_t line_size = 0;
+
+    while (getline(&line, &line_size, stream) != -1) {
+        line[strcspn(line, "\n")] = 0;
+        if (line[0] == '\0') {
+            continue;
+        }
+        if (n == capacity) {
+            capacity = capacity ? capacity * 2 : 64;
+            char** resized = realloc(names, capacity * sizeof(char*));
+            if (!resized) {
+                log_message("Out of memory while reading package names", "error");
+                break;
+            }
+            names = resized;
+        }
+        names[n] = strdup(line);
+        if (!names[n]) {
+            break;
+        }
+        n++;
+    }
+    free(line);
+
+    *count = n;
+    return names;
+}
+
+char** load_tool_list(const char* path, int* count) {
+    FILE* tool_list = fopen(path, "r");
     if (!tool_list) {
         log_message("Failed to open tool list", "error");
+        return NULL;
+    }
+    setvbuf(tool_list, NULL, _IOFBF, PIPE_BUFFER_SIZE);
+    posix_fadvise(fileno(tool_list), 0, 0, POSIX_FADV_SEQUENTIAL);
+
+    char** tools = read_name_lines(tool_list, count);
+    fclose(tool_list);
+    return tools;
+}
+
+int compare_package_names(const void* a, const void* b) {
+    return strcmp(*(const char* const*)a, *(const char* const*)b);
+}
+
+int compare_name_indices(const void* a, const void* b, void* arg) {
+    char* const* names = arg;
+    int ia = *(const int*)a;
+    int ib = *(const int*)b;
+    int cmp = strcmp(names[ia], names[ib]);
+    if (cmp != 0) {
+        return cmp;
+    }
+    return ia - ib;
+}
+
+/* Drop duplicate names while keeping first-seen order; overlapping
+ * categories list the same package more than once and installing it
+ * repeatedly just wastes transaction slots */
+int dedupe_tool_list(char** tools, int count) {
+    if (count < 2) {
+        return count;
+    }
+
+    int* order = malloc(count * sizeof(int));
+    char* drop = calloc(count, 1);
+    if (!order || !drop) {
+        free(order);
+        free(drop);
+        return count;
+    }
+
+    for (int i = 0; i < count; i++) {
+        order[i] = i;
+    }
+    qsort_r(order, count, sizeof(int), compare_name_indices, tools);
+
+    for (int i = 1; i < count; i++) {
+        if (strcmp(tools[order[i]], tools[order[i - 1]]) == 0) {
+            drop[order[i]] = 1;
+        }
+    }
+
+    int kept = 0;
+    for (int i = 0; i < count; i++) {
+        if (drop[i]) {
+            free(tools[i]);
+        } else {
+            tools[kept++] = tools[i];
+        }
+    }
+
+    free(order);
+    free(drop);
+    return kept;
+}
+
+/* Snapshot the locally installed packages with one query so the install
+ * loop can skip present packages without forking per tool */
+char** load_installed_packages(SystemType sys_type, int* count) {
+    const char* list_cmd = (sys_type == SYSTEM_ARCH)
+        ? "pacman -Qq"
+        : "dpkg-query -W -f='${Package}\\n'";
+    FILE* query = popen(list_cmd, "re");
+    if (!query) {
+        return NULL;
+    }
+    setvbuf(query, NULL, _IOFBF, PIPE_BUFFER_SIZE);
+
+    char** installed = read_name_lines(query, count);
+    if (pclose(query) != 0) {
+        free_tool_list(installed, *count);
+        *count = 0;
+        return NULL;
+    }
+
+    if (installed) {
+        qsort(installed, *count, sizeof(char*), compare_package_names);
+    }
+    return installed;
+}
+
+int package_is_installed(char* const* installed, int count, const char* name) {
+    return bsearch(&name, installed, count, sizeof(char*), compare_package_names) != NULL;
+}
+
+void free_tool_list(char** tools, int count) {
+    for (int i = 0; i < count; i++) {
+        free(tools[i]);
+    }
+    free(tools);
+}
+
+/* Persist the not-yet-installed tools so an interrupted run can resume.
+ * The state is written to a temp file and renamed into place so a crash
+ * mid-write can never leave a truncated state file behind */
+int save_install_state(char* const* tools, int count) {
+    char tmp_path[PATH_MAX];
+    snprintf(tmp_path, sizeof(tmp_path), "%s.tmp", STATE_FILE);
+
+    FILE* state = fopen(tmp_path, "w");
+    if (!state) {
+        log_message("Failed to write resume state", "error");
+        return 0;
+    }
+    setvbuf(state, NULL, _IOFBF, PIPE_BUFFER_SIZE);
+
+    // Root-only state: /var/tmp is world-writable, so do not leave the
+    // resume list readable or pre-creatable by other users
+    fchmod(fileno(state), 0600);
+
+    fprintf(state, "%s\n", STATE_FILE_HEADER);
+    for (int i = 0; i < count; i++) {
+        fprintf(state, "%s\n", tools[i]);
+    }
+
+    // The rename is only atomic against crashes if the data reaches
+    // disk first; otherwise a power cut can promote an empty file over
+    // the good state it replaced
+    fflush(state);
+    fsync(fileno(state));
+    fclose(state);
+
+    if (rename(tmp_path, STATE_FILE) != 0) {
+        log_message("Failed to save resume state", "error");
+        unlink(tmp_path);
+        return 0;
+    }
+
+    log_messagef("info", "Saved resume state with %d remaining packages", count);
+    return 1;
+}
+
+/* Resume state is a plain name list behind a version header; anything
+ * that does not announce the expected format is ignored rather than fed
+ * into the install loop */
+char** load_install_state(int* count) {
+    *count = 0;
+    FILE* state = fopen(STATE_FILE, "r");
+    if (!state) {
+        return NULL;
+    }
+
+    setvbuf(state, NULL, _IOFBF, PIPE_BUFFER_SIZE);
+
+    char header[MAX_LINE_LENGTH] = {0};
+    if (!fgets(header, sizeof(header), state)) {
+        fclose(state);
+        return NULL;
+    }
+    header[strcspn(header, "\n")] = 0;
+    if (strcmp(header, STATE_FILE_HEADER) != 0) {
+        log_message("Ignoring resume state with unknown format", "warning");
+        fclose(state);
+        return NULL;
+    }
+
+    char** tools = read_name_lines(state, count);
+    fclose(state);
+    return tools;
+}
+
+/* Package manager output is captured to a temp file; it is only read
+ * back on failure so successful installs never pay for parsing it */
+void log_captured_output(const char* context) {
+    FILE* captured = fopen(PACMAN_OUTPUT_FILE, "r");
+    if (!captured) {
         return;
     }
-    
-    // Count total packages
+
+    // The actual error is at the end of the capture; on a big transaction
+    // the head is pages of progress noise, so seek near the tail and log
+    // from there instead of streaming the whole file to find it
+    fseek(captured, 0, SEEK_END);
+    long size = ftell(captured);
+    long tail_start = size - 4096;
+    if (tail_start > 0) {
+        fseek(captured, tail_start, SEEK_SET);
+        // Drop the probably-partial first line after landing mid-file
+        char skip[MAX_LINE_LENGTH];
+        if (!fgets(skip, sizeof(skip), captured)) {
+            fclose(captured);
+            return;
+        }
+    } else {
+        rewind(captured);
+    }
+
     char line[MAX_LINE_LENGTH];
-    while (fgets(line, sizeof(line), tool_list)) {
+    int logged = 0;
+    while (fgets(line, sizeof(line), captured) && logged < 10) {
         line[strcspn(line, "\n")] = 0;
-        if (strlen(line) > 1) {
-            g_progress.total_packages++;
+        if (line[0] == '\0') {
+            continue;
         }
+        log_messagef("error", "%.40s: %.200s", context, line);
+        logged++;
     }
-    
+    fclose(captured);
+}
+
+/* Check the captured output for failures no retry can fix, such as a
+ * package that does not exist in any repository */
+int failure_is_permanent(void) {
+    // The capture file is already open for the whole install phase;
+    // rewinding that stream replaces an open/close pair per failed
+    // attempt, which adds up across a retry storm
+    FILE* captured = g_output.output_file;
+    if (!captured) {
+        return 0;
+    }
+    fflush(captured);
+    if (fseek(captured, 0, SEEK_SET) != 0) {
+        return 0;
+    }
+
+    char line[MAX_LINE_LENGTH];
+    int permanent = 0;
+    while (fgets(line, sizeof(line), captured)) {
+        if (strstr(line, "target not found") ||
+            strstr(line, "Unable to locate package")) {
+            permanent = 1;
+            break;
+        }
+    }
+    fseek(captured, 0, SEEK_END);
+    return permanent;
+}
+
+/* Both install command builders share one prefix per package manager;
+ * selecting it in one place keeps the chunk and single-tool paths from
+ * drifting apart flag by flag */
+static const char* install_cmd_prefix(SystemType sys_type) {
+    return (sys_type == SYSTEM_ARCH)
+            ? "pacman -S --noconfirm --needed --overwrite=\"*\""
+            : "DEBIAN_FRONTEND=noninteractive apt-get install -y";
+}
+
+int install_single_tool(SystemType sys_type, const char* tool) {
+    char install_cmd[MAX_CMD_LENGTH];
+    snprintf(install_cmd, sizeof(install_cmd), "%s %s >/dev/null",
+            install_cmd_prefix(sys_type), tool);
+
+    for (int attempt = 0; attempt < MAX_RETRIES; attempt++) {
+        reset_captured_output();
+        if (execute_command(install_cmd)) {
+            return 1;
+        }
+        if (failure_is_permanent()) {
+            break;
+        }
+        // Retrying without a network is guaranteed to fail; the cached
+        // check makes this nearly free across a burst of failures
+        if (!check_internet_connection()) {
+            log_message("Network appears down, not retrying", "warning");
+            break;
+        }
+        if (attempt < MAX_RETRIES - 1) {
+            // Exponential backoff with jitter so parallel failures on a
+            // flaky mirror do not retry in lockstep
+            double jitter = 0.5 + (double)rand() / RAND_MAX;
+            useconds_t delay = (useconds_t)((1u << attempt) * jitter * 1000000.0);
+            usleep(delay);
+        }
+    }
+    return 0;
+}
+
+/* Install a chunk of packages in one pacman transaction so the sync DB is
+ * loaded and dependencies are resolved once per chunk instead of per tool.
+ *
+ * Deliberately no concurrency here: the pacman DB lock serializes
+ * transactions anyway, so overlapped pacman processes would only fight
+ * over /var/lib/pacman/db.lck while pacman already parallelizes the part
+ * that benefits (downloads) inside a single transaction */
+int install_package_chunk(SystemType sys_type, char* const* tools, int count) {
+    size_t cmd_size = MAX_CMD_LENGTH;
+    for (int i = 0; i < count; i++) {
+        cmd_size += strlen(tools[i]) + 1;
+    }
+
+    char* cmd = malloc(cmd_size);
+    if (!cmd) {
+        log_message("Out of memory while building install command", "error");
+        return 0;
+    }
+
+    size_t offset = (size_t)snprintf(cmd, cmd_size, "%s",
+            install_cmd_prefix(sys_type));
+    for (int i = 0; i < count; i++) {
+        offset += (size_t)snprintf(cmd + offset, cmd_size - offset, " %s", tools[i]);
+    }
+    snprintf(cmd + offset, cmd_size - offset, " >/dev/null");
+
+    reset_captured_output();
+    int result = execute_command(cmd);
+    free(cmd);
+    return result;
+}
+
+/* A failed chunk usually contains only one or two bad packages. Bisecting
+ * the range isolates them with O(log n) extra transactions, where a
+ * per-package fallback would pay a full spawn for every package in it */
+void install_package_range(SystemType sys_type, char** tools, int count,
+                           char** failed, int* failed_count) {
+    if (count <= 0 || !keep_running) {
+        return;
+    }
+
+    float progress = ((float)g_progress.completed_packages /
+                      g_progress.total_packages) * 100.0;
+    show_smooth_progress(tools[0], progress);
+
+    if (count == 1) {
+        if (!install_single_tool(sys_type, tools[0])) {
+            log_messagef("error", "Failed to install: %.200s", tools[0]);
+            log_captured_output(tools[0]);
+            if (failed) {
+                failed[(*failed_count)++] = tools[0];
+            }
+        }
+        g_progress.completed_packages++;
+        return;
+    }
+
+    if (install_package_chunk(sys_type, tools, count)) {
+        g_progress.completed_packages += count;
+        return;
+    }
+
+    log_messagef("warning", "Transaction of %d packages failed, bisecting", count);
+
+    install_package_range(sys_type, tools, count / 2, failed, failed_count);
+    install_package_range(sys_type, tools + count / 2, count - count / 2,
+                          failed, failed_count);
+}
+
+void install_tools(SystemType sys_type) {
+    if (sys_type == SYSTEM_UNKNOWN) {
+        log_message("Unsupported system type", "error");
+        return;
+    }
+
+    g_progress.completed_packages = 0;
+    g_progress.show_details = 0;
+
+    int tool_count = 0;
+    char** tools = NULL;
+
+    tools = load_install_state(&tool_count);
+    if (tools) {
+        log_messagef("info", "Resuming interrupted installation with %d packages",
+                tool_count);
+    }
+    if (!tools) {
+        tools = load_tool_list(TEMP_FILE, &tool_count);
+    }
+    if (!tools) {
+        return;
+    }
+
+    int deduped = dedupe_tool_list(tools, tool_count);
+    if (deduped < tool_count) {
+        log_messagef("info", "Removed %d duplicate entries from tool list",
+                tool_count - deduped);
+        tool_count = deduped;
+    }
+
+    {
+        // pacman -Qq walks one small desc file per installed package;
+        // queue readahead for the whole local DB first so the query
+        // doesn't fault them in one synchronous read at a time. The
+        // dpkg status database is a single file and needs no walk
+        if (sys_type == SYSTEM_ARCH) {
+            warm_file_tree("/var/lib/pacman/local");
+        }
+
+        int installed_count = 0;
+        char** installed = load_installed_packages(sys_type, &installed_count);
+        if (installed) {
+            int kept = 0;
+            for (int i = 0; i < tool_count; i++) {
+                if (package_is_installed(installed, installed_count, tools[i])) {
+                    free(tools[i]);
+                } else {
+                    tools[kept++] = tools[i];
+                }
+            }
+            if (kept < tool_count) {
+                log_messagef("info", "Skipping %d already installed packages",
+                        tool_count - kept);
+            }
+            tool_count = kept;
+            free_tool_list(installed, installed_count);
+        }
+    }
+
+    g_progress.total_packages = tool_count;
     if (g_progress.total_packages == 0) {
-        log_message("No packages found to install", "warning");
-        fclose(tool_list);
+        log_message("All requested packages are already installed", "info");
+        unlink(STATE_FILE);
+        free_tool_list(tools, tool_count);
         return;
     }
-    
-    rewind(tool_list);
+
     redirect_output();
-    
-    printf("\033[2J\033[H");  // Clear screen
-    printf("%s", BANNER);
+
+    // main() already cleared the screen and rendered the banner; redrawing
+    // the whole thing here just repaints identical art
     show_smooth_progress("Preparing...", 0.0);
-    
-    while (fgets(line, sizeof(line), tool_list) && keep_running) {
-        line[strcspn(line, "\n")] = 0;
-        
-        if (strlen(line) > 0) {
-            strncpy(g_progress.current_package, line, MAX_LINE_LENGTH - 1);
-            g_progress.current_package[MAX_LINE_LENGTH - 1] = '\0';
-            
-            float progress = ((float)g_progress.completed_packages / g_progress.total_packages) * 100.0;
-            show_smooth_progress(line, progress);
-            
-    char install_cmd[MAX_CMD_LENGTH];
-    if (sys_type == SYSTEM_ARCH) {
-        snprintf(install_cmd, sizeof(install_cmd),
-                "pacman -S --noconfirm --needed --overwrite=\"*\" %s >/dev/null 2>%s",
-                line, PACMAN_OUTPUT_FILE);
+
+    // The remaining-work "set" is simply the tail of the tools array at
+    // next_index: completing a package advances the index instead of
+    // removing an element, so there is no per-completion O(n) shuffle
+    // even at BlackArch scale, and saving state is a pointer offset.
+    // Installed-package membership goes through the sorted snapshot and
+    // bsearch for the same reason.
+    int next_index = 0;
+    int done_since_save = 0;
+    struct timespec save_start;
+    clock_gettime(CLOCK_MONOTONIC, &save_start);
+    time_t last_save_time = save_start.tv_sec;
+    char** failed = malloc(tool_count * sizeof(char*));
+    int failed_count = 0;
+
+    for (int start = 0; start < tool_count && keep_running; start += INSTALL_CHUNK_SIZE) {
+        int chunk_len = tool_count - start;
+        if (chunk_len > INSTALL_CHUNK_SIZE) {
+            chunk_len = INSTALL_CHUNK_SIZE;
+        }
+
+        snprintf(g_progress.current_package, MAX_LINE_LENGTH, "%s", tools[start]);
+
+        // If interrupted mid-range, resume conservatively from the start
+        // of this chunk; --needed and apt's own up-to-date detection make
+        // the redo nearly free
+        next_index = start;
+        install_package_range(sys_type, &tools[start], chunk_len, failed, &failed_count);
+        if (keep_running) {
+            next_index = start + chunk_len;
+        }
+
+        // Checkpoint the remaining work every few hundred packages, or
+        // when the last save is more than two minutes stale — bisection
+        // storms can stretch a handful of chunks across many minutes —
+        // so a hard kill or power loss resumes from here rather than
+        // the start, without paying a state write per completion
+        struct timespec save_now;
+        clock_gettime(CLOCK_MONOTONIC, &save_now);
+        done_since_save += chunk_len;
+        if ((done_since_save >= 4 * INSTALL_CHUNK_SIZE ||
+             save_now.tv_sec - last_save_time >= 120) &&
+            next_index < tool_count) {
+            save_install_state(&tools[next_index], tool_count - next_index);
+            done_since_save = 0;
+            last_save_time = save_now.tv_sec;
+        }
+
+        // A chunk boundary is a cheap moment to make the buffered log
+        // durable; a crash mid-run then loses at most one chunk of lines
+        log_flush();
+    }
+
+    if (!keep_running && next_index < tool_count) {
+        save_install_state(&tools[next_index], tool_count - next_index);
+    } else if (failed_count > 0) {
+        // Keep the failed packages in the state file so the next run
+        // retries just those instead of the whole category
+        save_install_state(failed, failed_count);
     } else {
-        snprintf(install_cmd, sizeof(install_cmd),
-                "DEBIAN_FRONTEND=noninteractive apt-get install -y %s >/dev/null 2>%s",
-                line, PACMAN_OUTPUT_FILE);
+        unlink(STATE_FILE);
     }
-            
-            if (!execute_command(install_cmd)) {
-                char error_msg[MAX_LINE_LENGTH];
-                snprintf(error_msg, sizeof(error_msg), "Failed to install: %s", line);
-                log_message(error_msg, "error");
+    free(failed);
+
+    show_smooth_progress("Installation Complete", 100.0);
+    printf("\n");
+
+    // Verify the whole batch against one fresh installed-set snapshot
+    // rather than forking a query per package
+    if (keep_running) {
+        int installed_count = 0;
+        char** installed = load_installed_packages(sys_type, &installed_count);
+        if (installed) {
+            int missing = 0;
+            for (int i = 0; i < tool_count; i++) {
+                if (!package_is_installed(installed, installed_count, tools[i])) {
+                    missing++;
+                }
             }
-            
-            g_progress.completed_packages++;
-            usleep(LOADER_UPDATE_INTERVAL);
+            if (missing > 0) {
+                log_messagef("warning",
+                        "Verification: %d of %d packages are not installed",
+                        missing, tool_count);
+            } else {
+                log_messagef("info", "Verification: all %d packages present",
+                        tool_count);
+            }
+            free_tool_list(installed, installed_count);
         }
     }
-    
-    show_smooth_progress("Installation Complete", 100.0);
-    printf("\n");
-    
-    fclose(tool_list);
+
+    free_tool_list(tools, tool_count);
     restore_output();
-    
-    char completion_msg[MAX_LINE_LENGTH];
-    snprintf(completion_msg, sizeof(completion_msg),
-            "Completed installation of %d/%d packages",
+
+    log_messagef("info", "Completed installation of %d/%d packages",
             g_progress.completed_packages, g_progress.total_packages);
-    log_message(completion_msg, "info");
 }
 
 /* Cleanup Function */
 void cleanup_resources(void) {
-    if (access(TEMP_FILE, F_OK) != -1) {
-        remove(TEMP_FILE);
-    }
-    if (access(TEMP_KEYRING_DEB, F_OK) != -1) {
-        remove(TEMP_KEYRING_DEB);
+    // Registered with atexit and reachable from explicit call sites, so
+    // guard against running the teardown twice
+    static int cleaned_up = 0;
+    if (cleaned_up) {
+        return;
     }
+    cleaned_up = 1;
+
+    // remove() already reports ENOENT; probing with access() first just
+    // doubles the stat traffic and leaves a classic TOCTOU window
+    remove(TEMP_FILE);
+    remove(TEMP_FILE_TMP);
+    remove(TEMP_KEYRING_DEB);
+    remove(PACMAN_OUTPUT_FILE);
     cleanup_logging();
     printf("%s", RESET);
     fflush(stdout);
@@ -667,7 +2056,37 @@ void cleanup_resources(void) {
 }
 
 /* Main Program Entry */
-int main(void) {
+int main(int argc, char* argv[]) {
+    // Answer informational flags before touching the terminal, lock
+    // file or log so these invocations stay instant and side-effect free
+    for (int i = 1; i < argc; i++) {
+        if (strcmp(argv[i], "--help") == 0 || strcmp(argv[i], "-h") == 0) {
+            printf("Usage: sudo blackutility\n\n"
+                   "Installs BlackArch (Arch) or Kali (Debian-based) security\n"
+                   "tools for the detected distribution. Interrupted runs are\n"
+                   "resumed automatically on the next start.\n\n"
+                   "Options:\n"
+                   "  -h, --help     show this help and exit\n"
+                   "  -V, --version  show version information and exit\n");
+            return 0;
+        }
+        if (strcmp(argv[i], "--version") == 0 || strcmp(argv[i], "-V") == 0) {
+            printf("blackutility 1.0.0-STABLE\n");
+            return 0;
+        }
+        fprintf(stderr, "Unknown option: %s (try --help)\n", argv[i]);
+        return 1;
+    }
+
+    srand((unsigned int)(time(NULL) ^ getpid()));
+
+    stdout_is_tty = isatty(STDOUT_FILENO);
+
+    // Every package-manager command goes through the shell; pin a short
+    // system PATH once so each spawn resolves binaries in two directory
+    // probes and cannot be steered by a caller-supplied PATH
+    setenv("PATH", "/usr/sbin:/usr/bin:/sbin:/bin", 1);
+
     // Initialize terminal
     if (enable_raw_mode() == -1) {
         fprintf(stderr, "Failed to initialize terminal\n");
@@ -682,19 +2101,31 @@ int main(void) {
 
     // Initialize logging
     initialize_logging();
-    
+
+    // One line of host context per run, straight from the kernel; the
+    // equivalent uname/free forks would cost two spawns for values the
+    // uname() and sysinfo() syscalls hand over directly
+    struct utsname host;
+    struct sysinfo host_info;
+    if (uname(&host) == 0 && sysinfo(&host_info) == 0) {
+        log_messagef("info", "Host: %s %s %s, %lu MB RAM",
+                host.sysname, host.release, host.machine,
+                (host_info.totalram * host_info.mem_unit) / (1024 * 1024));
+    }
+
     // Set up signal handlers
-    signal(SIGINT, signal_handler);
-    signal(SIGALRM, alarm_handler);
-    signal(SIGTERM, signal_handler);
+    setup_signal_handlers();
     
     // Register cleanup function
     atexit(cleanup_resources);
 
-    // Clear screen and show banner
-    printf("\x1b[2J\x1b[H");
-    printf("%s", BANNER);
-    fflush(stdout);
+    // Clear screen and show banner; when output is piped or redirected
+    // the escape-laden art is just noise in the capture, so skip it
+    if (stdout_is_tty) {
+        printf("\x1b[2J\x1b[H");
+        printf("%s", BANNER);
+        fflush(stdout);
+    }
     
     // Check privileges
     if (!check_root_privileges()) {
@@ -714,7 +2145,7 @@ int main(void) {
            FG_WHITE, FG_GREEN, FG_WHITE, FG_RED, FG_WHITE, RESET);
     fflush(stdout);
 
-    char response[10] = {0};
+    char response[32] = {0};
     alarm(30);  // Set 30-second timeout
     if (fgets(response, sizeof(response), stdin) == NULL) {
         log_message("Input timeout or error", "error");
@@ -722,26 +2153,43 @@ int main(void) {
     }
     alarm(0);  // Clear timeout
 
-    response[strcspn(response, "\n")] = 0;
-    str_to_upper(response);
+    if (!strchr(response, '\n')) {
+        // Line longer than the buffer: drain the rest and treat the
+        // whole thing as a refusal rather than matching a truncation
+        int ch;
+        while ((ch = getchar()) != EOF && ch != '\n');
+        response[0] = '\0';
+    }
+
+    // Trim surrounding whitespace so "AGREE " or a pasted tab still counts
+    char* answer = response;
+    while (isspace((unsigned char)*answer)) {
+        answer++;
+    }
+    size_t answer_len = strlen(answer);
+    while (answer_len > 0 && isspace((unsigned char)answer[answer_len - 1])) {
+        answer[--answer_len] = '\0';
+    }
+    str_to_upper(answer);
     
-    if (strcmp(response, "AGREE") != 0) {
+    if (strcmp(answer, "AGREE") != 0) {
         log_message("Operation cancelled by user", "warning");
         return 1;
     }
 
-    // Generate tool list and install packages
-    if (!generate_tool_list()) {
+    // Generate tool list and install packages; detect once here and
+    // hand the result down rather than re-asking at each stage
+    SystemType sys_type = detect_system_type();
+    if (!generate_tool_list(sys_type)) {
         log_message("Failed to generate tool list", "error");
         return 1;
     }
 
-    install_tools();
+    install_tools(sys_type);
 
-    // Cleanup and exit
+    // Cleanup runs via the atexit handler
     log_message("Cleaning up...", "info");
-    cleanup_resources();
     disable_raw_mode();
-    
+
     return 0;
 }